@@ -0,0 +1,24 @@
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+
+
+class QueueStreamHandler(logging.Handler):
+    # Plain Handler rather than a QueueHandler subclass: dictConfig on 3.12+
+    # special-cases QueueHandler subclasses and would replace the queue/stream.
+    def __init__(self, stream=None):
+        super().__init__()
+        queue = SimpleQueue()
+        self.queue_handler = QueueHandler(queue)
+        self.stream_handler = logging.StreamHandler(stream)
+        self.listener = QueueListener(queue, self.stream_handler)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.stream_handler.setFormatter(fmt)
+
+    def emit(self, record):
+        self.queue_handler.emit(record)
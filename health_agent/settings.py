@@ -1,38 +1,52 @@
+import logging
 import os
+from functools import lru_cache
 from pathlib import Path
-import dj_database_url
-from dotenv import load_dotenv
 
 
-load_dotenv()
+@lru_cache(maxsize=None)
+def _env(key, default=None):
+    return os.environ.get(key, default)
+
+
+@lru_cache(maxsize=None)
+def _env_csv(key):
+    value = os.environ.get(key)
+    return tuple(item.strip() for item in value.split(',')) if value else ()
+
+
+_BOOL_TRUE = frozenset({'1', 'true', 'yes', 'on'})
+
+
+if _env('DOTENV_FILE') or not _env('RAILWAY_ENVIRONMENT'):
+    from dotenv import load_dotenv
+    load_dotenv(_env('DOTENV_FILE'))
+
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
 LOG_DIR = BASE_DIR / 'logs'
-LOG_DIR.mkdir(exist_ok=True)
 
 
-SECRET_KEY = os.environ.get('SECRET_KEY')
+SECRET_KEY = _env('SECRET_KEY')
 
 
-DEBUG = os.environ.get('DEBUG', 'False').lower() == 'true'
+DEBUG = _env('DEBUG', 'False').strip().lower() in _BOOL_TRUE
 
-GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
+GEMINI_API_KEY = _env('GEMINI_API_KEY')
 
 
-ALLOWED_HOSTS = []
-if os.environ.get('ALLOWED_HOSTS'):
-    ALLOWED_HOSTS = [host.strip() for host in os.environ.get('ALLOWED_HOSTS').split(',')]
+ALLOWED_HOSTS = _env_csv('ALLOWED_HOSTS')
 
 
 if not ALLOWED_HOSTS:
-    ALLOWED_HOSTS = [
+    ALLOWED_HOSTS = (
         'web-production-8b01c.up.railway.app',
         'localhost',
         '127.0.0.1',
         '.railway.app'
-    ]
+    )
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -77,13 +91,23 @@ TEMPLATES = [
 WSGI_APPLICATION = 'health_agent.wsgi.application'
 
 
-DATABASES = {
-    'default': dj_database_url.config(
-        default=os.environ.get('DATABASE_URL'),
-        conn_max_age=600,
-        conn_health_checks=True,
-    )
-}
+if _env('DATABASE_URL') is None:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+else:
+    import dj_database_url
+
+    DATABASES = {
+        'default': dj_database_url.config(
+            default=_env('DATABASE_URL'),
+            conn_max_age=600,
+            conn_health_checks=True,
+        )
+    }
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -101,8 +125,8 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
-LANGUAGE_CODE = os.environ.get('LANGUAGE_CODE', 'en-us')
-TIME_ZONE = os.environ.get('TIME_ZONE', 'UTC')
+LANGUAGE_CODE = _env('LANGUAGE_CODE', 'en-us')
+TIME_ZONE = _env('TIME_ZONE', 'UTC')
 USE_I18N = True
 USE_TZ = True
 
@@ -114,6 +138,10 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+logging.raiseExceptions = False
+logging.logThreads = False
+logging.logProcesses = False
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -130,7 +158,7 @@ LOGGING = {
     'handlers': {
         'console': {
             'level': 'INFO',
-            'class': 'logging.StreamHandler',
+            'class': 'health_agent.logging_config.QueueStreamHandler',
             'formatter': 'simple',
         },
     },
@@ -142,27 +170,29 @@ LOGGING = {
         },
         'health_tips': {
             'handlers': ['console'],
-            'level': 'DEBUG',
+            'level': _env('HEALTH_TIPS_LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO'),
             'propagate': False,
         },
     },
 }
 
+if any(handler.get('class', '').endswith('FileHandler') for handler in LOGGING['handlers'].values()):
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+
 
-CSRF_TRUSTED_ORIGINS = []
-if os.environ.get('CSRF_TRUSTED_ORIGINS'):
-    CSRF_TRUSTED_ORIGINS = [origin.strip() for origin in os.environ.get('CSRF_TRUSTED_ORIGINS').split(',')]
+CSRF_TRUSTED_ORIGINS = _env_csv('CSRF_TRUSTED_ORIGINS')
 
 
 if not CSRF_TRUSTED_ORIGINS:
-    CSRF_TRUSTED_ORIGINS = [
+    CSRF_TRUSTED_ORIGINS = (
         'https://web-production-8b01c.up.railway.app',
         'https://*.railway.app',
-    ]
+    )
 
 
 if not DEBUG:
     SECURE_SSL_REDIRECT = True
+    SECURE_REDIRECT_EXEMPT = [r'^health/?$']
     SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
     SESSION_COOKIE_SECURE = True
     CSRF_COOKIE_SECURE = True
\ No newline at end of file
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-15 22:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health_tips', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='healthtipdelivery',
+            name='delivery_time',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,117 @@
+import json
+from types import SimpleNamespace
+from unittest import mock
+from django.test import SimpleTestCase
+from . import views
+from .views import BATCH_MAX_SIZE, FALLBACK_TEXTS, GREETING_TEXT, GeminiHealthChat
+
+class A2ABatchTestCase(SimpleTestCase):
+    def post(self, body):
+        response = self.client.post('/a2a/health', data=json.dumps(body), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def rpc(self, request_id, method, text=None):
+        body = {"jsonrpc": "2.0", "id": request_id, "method": method}
+        if text is not None:
+            body["params"] = {"message": {"kind": "message", "role": "user", "parts": [{"kind": "text", "text": text}]}}
+        return body
+
+    def test_mixed_batch(self):
+        data = self.post([self.rpc("1", "message/send", "hi"), self.rpc("2", "help"), self.rpc("3", "nope")])
+        self.assertEqual([item["id"] for item in data], ["1", "2", "3"])
+        self.assertEqual(data[0]["result"]["status"]["message"]["parts"][0]["text"], GREETING_TEXT)
+        self.assertEqual(data[1]["result"]["kind"], "task")
+        self.assertEqual(data[2]["error"]["code"], -32601)
+
+    def test_empty_batch(self):
+        data = self.post([])
+        self.assertEqual(data["error"]["code"], -32600)
+
+    def test_non_dict_entry(self):
+        data = self.post([5, self.rpc("1", "help")])
+        self.assertEqual(data[0]["error"]["code"], -32600)
+        self.assertEqual(data[1]["result"]["kind"], "task")
+
+    def test_stream_in_batch(self):
+        data = self.post([self.rpc("1", "message/stream", "hi")])
+        self.assertEqual(data[0]["id"], "1")
+        self.assertEqual(data[0]["error"]["code"], -32600)
+
+    def test_oversized_batch(self):
+        data = self.post([self.rpc(str(i), "help") for i in range(BATCH_MAX_SIZE + 1)])
+        self.assertEqual(data["error"]["code"], -32600)
+
+
+class FakeModels:
+    def __init__(self, chunks, error=None):
+        self.chunks = chunks
+        self.error = error
+
+    async def generate_content_stream(self, **kwargs):
+        async def stream():
+            for text in self.chunks:
+                yield SimpleNamespace(text=text)
+            if self.error:
+                raise self.error
+        return stream()
+
+
+class A2AStreamTestCase(SimpleTestCase):
+    message = "I can't sleep at night"
+
+    def make_chat(self, chunks, error=None):
+        chat = GeminiHealthChat()
+        client = SimpleNamespace(aio=SimpleNamespace(models=FakeModels(chunks, error)))
+        chat.client = client
+        chat.new_client = lambda: client
+        chat.available = True
+        return chat
+
+    async def stream(self, chat):
+        body = {
+            "jsonrpc": "2.0",
+            "id": "1",
+            "method": "message/stream",
+            "params": {"message": {"kind": "message", "role": "user", "parts": [{"kind": "text", "text": self.message}]}},
+        }
+        with mock.patch.object(views, "_GEMINI_CHAT", chat):
+            response = await self.async_client.post('/a2a/health', data=json.dumps(body), content_type='application/json')
+            self.assertEqual(response["Content-Type"], "text/event-stream")
+            content = b"".join([chunk async for chunk in response.streaming_content])
+        return [json.loads(frame[len(b"data: "):]) for frame in content.split(b"\n\n") if frame]
+
+    async def test_normal_stream(self):
+        chat = self.make_chat(["Drink ", "water ", "often."])
+        frames = await self.stream(chat)
+        updates = [frame["result"] for frame in frames[:-1]]
+        self.assertEqual([update["artifact"]["parts"][0]["text"] for update in updates], ["Drink ", "water ", "often."])
+        self.assertEqual([update["lastChunk"] for update in updates], [False, False, True])
+        self.assertEqual([update["append"] for update in updates], [False, True, True])
+        task = frames[-1]["result"]
+        self.assertEqual(task["kind"], "task")
+        self.assertEqual(task["status"]["state"], "completed")
+        self.assertEqual(task["artifacts"][0]["parts"][0]["text"], "Drink water often.")
+        self.assertEqual(len(chat.response_cache), 1)
+
+    async def test_failure_after_text(self):
+        chat = self.make_chat(["Drink ", "water"], RuntimeError("stream dropped"))
+        frames = await self.stream(chat)
+        self.assertEqual(frames[-1]["error"]["code"], -32603)
+        self.assertNotIn("task", [frame.get("result", {}).get("kind") for frame in frames])
+        self.assertEqual(len(chat.response_cache), 0)
+
+    async def test_failure_before_text(self):
+        chat = self.make_chat([], RuntimeError("unavailable"))
+        frames = await self.stream(chat)
+        task = frames[-1]["result"]
+        self.assertEqual(task["status"]["state"], "completed")
+        self.assertEqual(task["artifacts"][0]["parts"][0]["text"], FALLBACK_TEXTS["sleep"])
+        self.assertEqual(len(chat.response_cache), 0)
+
+    async def test_stream_without_text(self):
+        chat = self.make_chat([None, ""])
+        frames = await self.stream(chat)
+        task = frames[-1]["result"]
+        self.assertEqual(task["artifacts"][0]["parts"][0]["text"], FALLBACK_TEXTS["sleep"])
+        self.assertEqual(len(chat.response_cache), 0)
@@ -1,14 +1,21 @@
+import asyncio
 import logging
-import json
+import hashlib
 import uuid
 import os
 import re
-from django.http import JsonResponse
+import string
+import threading
+import weakref
+from collections import deque
+from types import MappingProxyType
+from django.http import HttpRequest, HttpResponse, HttpResponseBase, StreamingHttpResponse
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.utils import timezone
-from datetime import datetime
+from cachetools import LRUCache, TTLCache
+import orjson
 
 logger = logging.getLogger(__name__)
 
@@ -34,25 +41,174 @@ EXAMPLES OF HEALTH TOPICS TO ANSWER:
 - Any health-related concerns
 """
 
+HISTORY_MAX_SESSIONS = int(os.getenv("HISTORY_MAX_SESSIONS", "10000"))
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "10"))
+HISTORY_TTL_SECONDS = 3600
+HISTORY_SEED = (
+    {"role": "system", "content": SYSTEM_PROMPT_TEXT},
+    {"role": "assistant", "content": "Hello! I'm Health Buddy, your dedicated health and wellness assistant. How can I help you today?"},
+)
+RESPONSE_CACHE_SIZE = 2048
+RESPONSE_CACHE_VERSION = b"1"
+
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "32"))
+# Semaphores bind to the event loop that first waits on them. Under WSGI,
+# asgiref runs every async view call on a fresh loop, so keep one per loop.
+_GEMINI_SEMAPHORES = weakref.WeakKeyDictionary()
+_GEMINI_SEMAPHORES_LOCK = threading.Lock()
+
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "32"))
+BATCH_MAX_CONCURRENCY = 8
+
+GENERATION_CONFIG = {
+    "system_instruction": SYSTEM_PROMPT_TEXT,
+    "temperature": 0.2,
+    "max_output_tokens": 500,
+}
+
 REFUSAL_TEXT = "I specialize only in health and wellness topics. I can help with nutrition, exercise, mental health, sleep, or other health-related questions!"
 
+CLARIFY_TEXT = "Could you tell me a bit more about your health or wellness question?"
+
+GREETING_TEXT = "Hello! I'm Health Buddy, your dedicated health and wellness assistant! I'm here to help with nutrition, exercise, mental health, sleep, and all health-related questions. How can I support your wellness journey today?"
+
+UNAVAILABLE_TEXT = "Hello! I'm Health Buddy. I specialize in health and wellness topics. How can I assist you today?"
+
+# Replies used when the Gemini call fails, checked in order against the message topics.
+FALLBACK_TEXTS = MappingProxyType({
+    'pain': "I understand you're dealing with head pain. General wellness tips include staying hydrated, resting in a quiet environment, and managing stress. For persistent issues, consulting a healthcare provider is recommended.",
+    'nutrition': "Nutrition is key to overall health! A balanced diet with fruits, vegetables, and whole grains supports wellbeing.",
+    'exercise': "Regular exercise benefits both physical and mental health! Finding activities you enjoy makes consistency easier.",
+    'sleep': "Quality sleep is essential! Consistent routines and comfortable environments can improve sleep.",
+    'stress': "Mental wellness matters! Techniques like deep breathing, mindfulness, and social connection can help manage stress.",
+})
+DEFAULT_FALLBACK_TEXT = "Hello! I'm Health Buddy, your wellness assistant. I'd love to help with health topics like nutrition, exercise, sleep, stress management, or general wellbeing. What would you like to discuss?"
+
+GREETINGS = frozenset({'hi', 'hello', 'how are you', 'hey', 'whats up', "what's up"})
+GREETING_MAX_LENGTH = max(map(len, GREETINGS))
+
+BOT_INDICATORS = (
+    'here are some', 'steps you can take', 'suggestions to help',
+    'advice for', 'tips that might help', 'consider taking',
+    'you can use', 'it\'s essential to', 'contact a healthcare',
+    'rinse with warm salt water', 'over-the-counter', 'cold compress',
+    'avoid irritating foods', 'maintain oral hygiene', 'topical anesthetics',
+    'stay hydrated', 'see a dentist'
+)
+
+NORMALIZE_TABLE = str.maketrans(dict.fromkeys(string.punctuation, " "))
+
+WORD_REGEX = re.compile(r"[^\W\d_]{2,}")
+
+OFF_TOPIC_WORDS = ('movie', 'sport', 'game', 'music', 'stock', 'crypto', 'weather')
+
+TOPIC_KEYWORDS = {
+    'off': OFF_TOPIC_WORDS,
+    'pain': ('headache', 'migraine', 'head pain'),
+    'nutrition': ('diet', 'nutrition', 'food'),
+    'exercise': ('exercise', 'workout', 'fitness'),
+    'sleep': ('sleep', 'tired', 'insomnia'),
+    'stress': ('stress', 'anxiety', 'mental'),
+}
+
+TOPIC_REGEX = re.compile(
+    '|'.join(
+        f"(?P<{name}>{'|'.join(sorted(map(re.escape, words), key=len, reverse=True))})"
+        for name, words in TOPIC_KEYWORDS.items()
+    )
+)
+
+
+def normalize_message(text: str) -> str:
+    return " ".join((text or "").casefold().translate(NORMALIZE_TABLE).split())
+
+
+def classify_topics(normalized: str) -> frozenset:
+    return frozenset(match.lastgroup for match in TOPIC_REGEX.finditer(normalized))
+
+
+def classify_intent(message: str) -> str:
+    text = (message or "").strip()
+    # Only messages short enough to be a greeting pay for lowercasing.
+    if not text or (len(text) <= GREETING_MAX_LENGTH and text.lower() in GREETINGS):
+        return "greet"
+    return "chat"
+
+
+def utc_timestamp() -> str:
+    return timezone.now().isoformat().replace("+00:00", "Z")
+
+
+def new_ids(count: int) -> list:
+    raw = os.urandom(16 * count)
+    return [str(uuid.UUID(bytes=raw[i:i + 16], version=4)) for i in range(0, len(raw), 16)]
+
+
+def json_response(payload) -> HttpResponse:
+    return HttpResponse(orjson.dumps(payload), content_type="application/json")
+
+
+def sse_frame(payload: dict) -> bytes:
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+
+async def iter_text(text: str):
+    yield text
+
+
+def response_cache_key(normalized: str) -> bytes:
+    return hashlib.blake2b(normalized.encode(), digest_size=16, person=RESPONSE_CACHE_VERSION).digest()
+
+
+def extract_response_text(response) -> str:
+    # response.text is None when no candidate came back, e.g. a blocked prompt.
+    text = (getattr(response, "text", None) or "").strip()
+    if not text:
+        raise ValueError("Gemini returned no text")
+    return text
+
+
+def gemini_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    with _GEMINI_SEMAPHORES_LOCK:
+        semaphore = _GEMINI_SEMAPHORES.get(loop)
+        if semaphore is None:
+            semaphore = _GEMINI_SEMAPHORES[loop] = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+    return semaphore
+
+
+def gemini_api_key():
+    return os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+
+
+def gemini_env_available() -> bool:
+    return GENAI_CLIENT_AVAILABLE and bool(gemini_api_key())
+
 GENAI_CLIENT_AVAILABLE = False
 try:
     from google import genai
     GENAI_CLIENT_AVAILABLE = True
     logger.info("New google-genai client available")
 except ImportError as e:
-    logger.warning(f"New google-genai not available: {e}")
+    logger.warning("New google-genai not available: %s", e)
     GENAI_CLIENT_AVAILABLE = False
 
 class GeminiHealthChat:
     def __init__(self):
         self.available = False
         self.client = None
-        self.conversation_history = {}
-        self.api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+        self.conversation_history = TTLCache(maxsize=HISTORY_MAX_SESSIONS, ttl=HISTORY_TTL_SECONDS)
+        # cachetools caches are not thread-safe (LRUCache.get reorders on read),
+        # and a turn is two appends that must stay paired.
+        self.cache_lock = threading.Lock()
+        self.response_cache = LRUCache(maxsize=RESPONSE_CACHE_SIZE)
+        # The SDK's pooled httpx.AsyncClient is tied to one event loop, see gemini_semaphore().
+        self.loop_clients = weakref.WeakKeyDictionary()
+        self.client_claimed = False
+        self.client_lock = threading.Lock()
+        self.api_key = gemini_api_key()
         
-        logger.info(f"API Key available: {bool(self.api_key)}")
+        logger.info("API Key available: %s", bool(self.api_key))
         
         if not self.api_key:
             logger.warning("Gemini API key not found in env (GEMINI_API_KEY or GOOGLE_API_KEY)")
@@ -60,113 +216,220 @@ class GeminiHealthChat:
 
         if GENAI_CLIENT_AVAILABLE:
             try:
-                self.client = genai.Client(api_key=self.api_key)
+                self.client = self.new_client()
                 self.available = True
                 logger.info("Google GenAI client initialized successfully")
             except Exception as e:
-                logger.error(f"Failed to initialize Google GenAI client: {e}")
+                logger.error("Failed to initialize Google GenAI client: %s", e)
                 self.available = False
         else:
             logger.warning("No generative AI library available.")
 
+    def new_client(self):
+        return genai.Client(api_key=self.api_key)
+
+    def loop_client(self):
+        loop = asyncio.get_running_loop()
+        with self.client_lock:
+            client = self.loop_clients.get(loop)
+            if client is None:
+                # The client built at startup serves the first loop; under ASGI that is the only one.
+                client = self.new_client() if self.client_claimed else self.client
+                self.client_claimed = True
+                self.loop_clients[loop] = client
+        return client
+
     def get_conversation_history(self, session_id):
-        if session_id not in self.conversation_history:
-            self.conversation_history[session_id] = [
-                {"role": "system", "content": SYSTEM_PROMPT_TEXT},
-                {"role": "assistant", "content": "Hello! I'm Health Buddy, your dedicated health and wellness assistant. How can I help you today?"}
-            ]
-        return self.conversation_history[session_id]
+        with self.cache_lock:
+            tail = self.conversation_history.get(session_id)
+            if tail is None:
+                tail = deque(maxlen=HISTORY_MAX_TURNS * 2)
+            # Reassigning refreshes the TTL on every access.
+            self.conversation_history[session_id] = tail
+        return HISTORY_SEED, tail
 
     def reset_history(self, session_id):
-        if session_id in self.conversation_history:
-            del self.conversation_history[session_id]
-
-    def chat(self, user_message: str, session_id: str = "default"):
-        logger.info(f"Processing user message: '{user_message}' for session: {session_id}")
+        with self.cache_lock:
+            self.conversation_history.pop(session_id, None)
+
+    def remember_turn(self, session_id, user_message, text):
+        _, tail = self.get_conversation_history(session_id)
+        with self.cache_lock:
+            tail.append({"role": "user", "content": user_message})
+            tail.append({"role": "assistant", "content": text})
+
+    def cached_reply(self, session_id, user_message, cache_key):
+        with self.cache_lock:
+            text = self.response_cache.get(cache_key)
+        if text is not None:
+            logger.info("Serving cached response for: '%s'", user_message)
+            self.remember_turn(session_id, user_message, text)
+        return text
+
+    def record_reply(self, session_id, user_message, text, cache_key):
+        logger.info("Gemini response received: '%s'", text)
         
-        user_lower = user_message.lower()
-        clearly_off_topic = any(word in user_lower for word in ['movie', 'sport', 'game', 'music', 'stock', 'crypto', 'weather'])
+        if text:
+            with self.cache_lock:
+                self.response_cache[cache_key] = text
+        self.remember_turn(session_id, user_message, text)
+        
+        return text
+
+    def fallback_reply(self, topics):
+        return next((text for topic, text in FALLBACK_TEXTS.items() if topic in topics), DEFAULT_FALLBACK_TEXT)
+
+    def prepare_reply(self, user_message, session_id):
+        """Return (reply, topics, cache_key); reply is None when Gemini must be called."""
+        normalized = normalize_message(user_message)
+        topics = classify_topics(normalized)
         
-        if clearly_off_topic:
+        if 'off' in topics:
             logger.info("Message detected as off-topic, sending refusal")
-            return REFUSAL_TEXT
+            return REFUSAL_TEXT, topics, None
+        
+        if not WORD_REGEX.search(normalized):
+            logger.info("Message has no words, asking for clarification")
+            return CLARIFY_TEXT, topics, None
+        
+        cache_key = response_cache_key(normalized)
+        cached = self.cached_reply(session_id, user_message, cache_key)
+        if cached is not None:
+            return cached, topics, cache_key
+        
+        if not self.available:
+            logger.warning("Gemini client not available, using fallback response")
+            return UNAVAILABLE_TEXT, topics, cache_key
+        
+        return None, topics, cache_key
+
+    async def achat(self, user_message: str, session_id: str = "default") -> str:
+        logger.info("Processing user message: '%s' for session: %s", user_message, session_id)
+        
+        reply, topics, cache_key = self.prepare_reply(user_message, session_id)
+        if reply is not None:
+            return reply
         
         try:
-            if GENAI_CLIENT_AVAILABLE and self.client:
-                logger.info(f"Calling Gemini 2.0 Flash with: '{user_message}'")
-                
-                response = self.client.models.generate_content(
+            logger.info("Calling Gemini 2.0 Flash with: '%s'", user_message)
+            
+            async with gemini_semaphore():
+                response = await self.loop_client().aio.models.generate_content(
                     model=MODEL_NAME,
                     contents=[user_message],
-                    config={
-                        "system_instruction": SYSTEM_PROMPT_TEXT,
-                        "temperature": 0.2,
-                        "max_output_tokens": 500,
-                    }
+                    config=GENERATION_CONFIG
                 )
+            return self.record_reply(session_id, user_message, extract_response_text(response), cache_key)
                 
-                text = ""
-                if hasattr(response, 'text'):
-                    text = response.text
-                elif hasattr(response, 'candidates') and response.candidates:
-                    text = response.candidates[0].content.parts[0].text
-                else:
-                    text = str(response)
-                
-                text = text.strip()
-                logger.info(f"Gemini response received: '{text}'")
-                
-                history = self.get_conversation_history(session_id)
-                history.append({"role": "user", "content": user_message})
-                history.append({"role": "assistant", "content": text})
-                self.conversation_history[session_id] = history
-                
-                return text
-                
-            else:
-                logger.warning("Gemini client not available, using fallback response")
-                return "Hello! I'm Health Buddy. I specialize in health and wellness topics. How can I assist you today?"
+        except Exception as e:
+            logger.error("Gemini API call failed: %s", e)
+            return self.fallback_reply(topics)
+
+    async def astream(self, user_message: str, session_id: str = "default"):
+        """Yield the reply in chunks as Gemini produces them."""
+        logger.info("Streaming user message: '%s' for session: %s", user_message, session_id)
+        
+        reply, topics, cache_key = self.prepare_reply(user_message, session_id)
+        if reply is not None:
+            yield reply
+            return
+        
+        logger.info("Streaming Gemini 2.0 Flash with: '%s'", user_message)
+        
+        queue = asyncio.Queue()
+        producer = asyncio.create_task(self.pump_stream(user_message, queue))
+        chunks = []
+        try:
+            while (chunk := await queue.get()) is not None:
+                chunks.append(chunk)
+                yield chunk
+            await producer
+            text = "".join(chunks).strip()
+            if not text:
+                raise ValueError("Gemini returned no text")
                 
         except Exception as e:
-            logger.error(f"Gemini API call failed: {str(e)}")
-            
-            user_lower = user_message.lower()
-            if any(word in user_lower for word in ['headache', 'migraine', 'head pain']):
-                return "I understand you're dealing with head pain. General wellness tips include staying hydrated, resting in a quiet environment, and managing stress. For persistent issues, consulting a healthcare provider is recommended."
-            elif any(word in user_lower for word in ['diet', 'nutrition', 'food']):
-                return "Nutrition is key to overall health! A balanced diet with fruits, vegetables, and whole grains supports wellbeing."
-            elif any(word in user_lower for word in ['exercise', 'workout', 'fitness']):
-                return "Regular exercise benefits both physical and mental health! Finding activities you enjoy makes consistency easier."
-            elif any(word in user_lower for word in ['sleep', 'tired', 'insomnia']):
-                return "Quality sleep is essential! Consistent routines and comfortable environments can improve sleep."
-            elif any(word in user_lower for word in ['stress', 'anxiety', 'mental']):
-                return "Mental wellness matters! Techniques like deep breathing, mindfulness, and social connection can help manage stress."
-            else:
-                return "Hello! I'm Health Buddy, your wellness assistant. I'd love to help with health topics like nutrition, exercise, sleep, stress management, or general wellbeing. What would you like to discuss?"
+            logger.error("Gemini streaming call failed: %s", e)
+            # Once text has been sent, a fallback would be spliced onto a partial answer.
+            if chunks:
+                raise
+            yield self.fallback_reply(topics)
+            return
+        finally:
+            producer.cancel()
+        
+        self.record_reply(session_id, user_message, text, cache_key)
+
+    async def pump_stream(self, user_message: str, queue: asyncio.Queue):
+        # Drains Gemini into the queue so the semaphore is not held while the client reads.
+        try:
+            async with gemini_semaphore():
+                stream = await self.loop_client().aio.models.generate_content_stream(
+                    model=MODEL_NAME,
+                    contents=[user_message],
+                    config=GENERATION_CONFIG
+                )
+                async for chunk in stream:
+                    if chunk.text:
+                        queue.put_nowait(chunk.text)
+        finally:
+            queue.put_nowait(None)
+
+_GEMINI_CHAT = None
+_GEMINI_CHAT_LOCK = threading.Lock()
+
+
+def get_gemini_chat():
+    global _GEMINI_CHAT
+    if _GEMINI_CHAT is None:
+        with _GEMINI_CHAT_LOCK:
+            if _GEMINI_CHAT is None:
+                _GEMINI_CHAT = GeminiHealthChat()
+    return _GEMINI_CHAT
 
 @method_decorator(csrf_exempt, name='dispatch')
 class A2AHealthView(View):
-    def __init__(self):
-        super().__init__()
-        logger.info("Initializing A2AHealthView...")
-        self.gemini_chat = GeminiHealthChat()
-        logger.info(f"Gemini chat available: {self.gemini_chat.available}")
+    @property
+    def gemini_chat(self):
+        # Resolved on use so greetings, help and errors never build the client.
+        return get_gemini_chat()
 
-    def post(self, request):
+    async def post(self, request: HttpRequest) -> HttpResponse:
         logger.info("Received POST request to A2A endpoint")
         try:
-            try:
-                body = json.loads(request.body)
-                logger.info(f"Request body parsed successfully, ID: {body.get('id', 'unknown')}")
-            except json.JSONDecodeError:
-                logger.error("Invalid JSON in request body")
-                return self.build_error_response(None, -32700, "Parse error: Invalid JSON")
-
-            
-            if body.get("jsonrpc") != "2.0" or "id" not in body:
+            body = orjson.loads(request.body)
+        except orjson.JSONDecodeError:
+            logger.error("Invalid JSON in request body")
+            return self.build_error_response(None, -32700, "Parse error: Invalid JSON")
+
+        if isinstance(body, list):
+            if not body:
+                logger.error("Empty JSON-RPC batch")
+                return self.build_error_response(None, -32600, "Invalid Request: empty batch")
+            if len(body) > BATCH_MAX_SIZE:
+                logger.error("JSON-RPC batch too large: %s entries", len(body))
+                return self.build_error_response(None, -32600, f"Invalid Request: batch exceeds {BATCH_MAX_SIZE} entries")
+            logger.info("Processing JSON-RPC batch of %s requests", len(body))
+            # One batch must not take every gemini_semaphore() slot on the worker.
+            limit = asyncio.Semaphore(min(len(body), BATCH_MAX_CONCURRENCY))
+
+            async def handle_entry(entry):
+                async with limit:
+                    return await self.handle_rpc(entry, batched=True)
+
+            results = await asyncio.gather(*(handle_entry(entry) for entry in body))
+            return json_response(results)
+
+        result = await self.handle_rpc(body)
+        return result if isinstance(result, HttpResponseBase) else json_response(result)
+
+    async def handle_rpc(self, body, batched: bool = False):
+        """Handle one JSON-RPC request; returns a payload dict, or a response for message/stream."""
+        try:
+            if not isinstance(body, dict) or body.get("jsonrpc") != "2.0" or "id" not in body:
                 logger.error("Invalid JSON-RPC request: missing jsonrpc or id")
-                return self.build_error_response(
-                    body.get("id"), 
+                return self.build_error_payload(
+                    body.get("id") if isinstance(body, dict) else None, 
                     -32600, 
                     "Invalid Request: jsonrpc must be '2.0' and id is required"
                 )
@@ -176,30 +439,38 @@ class A2AHealthView(View):
             
             if not method:
                 logger.error("No method specified in request")
-                return self.build_error_response(request_id, -32601, "Method not found")
+                return self.build_error_payload(request_id, -32601, "Method not found")
 
             params = body.get("params", {})
-            logger.info(f"Processing A2A request: method={method}, ID={request_id}")
+            logger.info("Processing A2A request: method=%s, ID=%s", method, request_id)
 
             if method == "message/send":
-                return self.handle_message_send(request_id, params)
+                return await self.handle_message_send(request_id, params)
+            elif method == "message/stream":
+                if batched:
+                    logger.error("message/stream is not allowed in a batch")
+                    return self.build_error_payload(request_id, -32600, "Invalid Request: message/stream cannot be batched")
+                return self.handle_message_stream(request_id, params)
             elif method == "help":
                 return self.handle_help(request_id, params)
             else:
-                logger.error(f"Method not found: {method}")
-                return self.build_error_response(request_id, -32601, f"Method not found: {method}")
+                logger.error("Method not found: %s", method)
+                return self.build_error_payload(request_id, -32601, f"Method not found: {method}")
 
         except Exception as e:
-            logger.exception(f"Unexpected error in A2A endpoint: {str(e)}")
-            return self.build_error_response(
-                body.get("id") if 'body' in locals() else None, 
+            logger.exception("Unexpected error in A2A endpoint: %s", e)
+            return self.build_error_payload(
+                body.get("id") if isinstance(body, dict) else None, 
                 -32603, 
                 f"Internal error: {str(e)}"
             )
 
-    def build_error_response(self, request_id, code, message):
-        logger.info(f"Building error response: code={code}, message={message}")
-        return JsonResponse({
+    def build_error_response(self, request_id, code: int, message: str) -> HttpResponse:
+        logger.info("Building error response: code=%s, message=%s", code, message)
+        return json_response(self.build_error_payload(request_id, code, message))
+
+    def build_error_payload(self, request_id, code: int, message: str) -> dict:
+        return {
             "jsonrpc": "2.0",
             "id": request_id or "",
             "error": {
@@ -207,185 +478,162 @@ class A2AHealthView(View):
                 "message": message,
                 "data": {}
             }
-        })
+        }
 
-    def handle_message_send(self, request_id, params):
-        logger.info(f"Processing message/send request: {request_id}")
+    async def handle_message_send(self, request_id, params: dict) -> dict:
+        logger.info("Processing message/send request: %s", request_id)
         try:
             message = params.get("message", {})
-            context_id = message.get("taskId") or str(uuid.uuid4())
-            task_id = message.get("messageId") or str(uuid.uuid4())
-
-            logger.info(f"Context ID: {context_id}, Task ID: {task_id}")
-            
-            user_message = ""
-            parts = message.get("parts", [])
-            
-            logger.info(f"Found {len(parts)} parts in message")
-            
-            
-            for i, part in enumerate(parts):
-                part_kind = part.get('kind', 'unknown')
-                part_text = part.get('text', '')[:100] if part.get('text') else 'NO_TEXT'
-                logger.info(f"Part {i}: kind={part_kind}, text_preview='{part_text}'")
-                
-                
-                if part.get('data'):
-                    logger.info(f"Part {i} data: {part.get('data')}")
-
-            
-            user_messages = []
-            
-            for part in parts:
-                if part.get("kind") == "data" and part.get("data"):
-                    data_items = part.get("data", [])
-                    logger.info(f"Found data part with {len(data_items)} items")
-                    
-                    for item in data_items:
-                        if (isinstance(item, dict) and 
-                            item.get("kind") == "text" and 
-                            item.get("text")):
-                            
-                            text = item.get("text", "").strip()
-                           
-                            if text and not self.is_bot_response(text):
-                                user_messages.append(text)
-                                logger.info(f"Found user message in data: '{text}'")
-            
-           
-            if user_messages:
-                user_message = user_messages[-1]  
-                logger.info(f"Selected most recent user message from data: '{user_message}'")
-            
-            
-            if not user_message:
-                text_parts = []
-                for part in parts:
-                    if part.get("kind") == "text" and part.get("text"):
-                        text = part.get("text", "").strip()
-                        
-                        if text and not self.is_bot_response(text):
-                            text_parts.append(text)
-                            logger.info(f"Found text part (filtered): '{text}'")
-                
-                if text_parts:
-                    user_message = text_parts[-1]
-                    logger.info(f"Selected user message from text parts: '{user_message}'")
-                else:
-                    logger.warning("No user messages found in request")
-                    user_message = ""
+            context_id, task_id = self.resolve_ids(message)
+            user_message = self.extract_user_message(message.get("parts", []))
 
             session_id = context_id
 
            
-            if not user_message:
-                response_text = "Hello! I'm Health Buddy, your dedicated health and wellness assistant! I'm here to help with nutrition, exercise, mental health, sleep, and all health-related questions. How can I support your wellness journey today?"
-                logger.info("Sending default greeting (no user message)")
-            elif user_message.lower() in ['hi', 'hello', 'how are you', 'hey', 'whats up', "what's up"]:
-                response_text = "Hello! I'm Health Buddy, your dedicated health and wellness assistant! I'm here to help with nutrition, exercise, mental health, sleep, and all health-related questions. How can I support your wellness journey today?"
+            if classify_intent(user_message) == "greet":
+                response_text = GREETING_TEXT
                 logger.info("Sending greeting response")
             else:
-                logger.info(f"Sending to Gemini: '{user_message}'")
-                response_text = self.gemini_chat.chat(user_message, session_id)
-                logger.info(f"Gemini response: '{response_text}'")
+                logger.info("Sending to Gemini: '%s'", user_message)
+                response_text = await self.gemini_chat.achat(user_message, session_id)
+                logger.info("Gemini response: '%s'", response_text)
 
             response = self.build_success_response(request_id, response_text, context_id, task_id)
-            logger.info(f"Successfully built response for request: {request_id}")
+            logger.info("Successfully built response for request: %s", request_id)
             
-            return JsonResponse(response)
+            return response
 
         except Exception as e:
-            logger.exception(f"Error in handle_message_send: {str(e)}")
-            return self.build_error_response(request_id, -32603, f"Internal error: {str(e)}")
+            logger.exception("Error in handle_message_send: %s", e)
+            return self.build_error_payload(request_id, -32603, f"Internal error: {str(e)}")
 
-    def is_bot_response(self, text: str) -> bool:
-        
-        text_lower = text.lower()
+    def resolve_ids(self, message: dict) -> tuple:
+        new_context_id, new_task_id = new_ids(2)
+        context_id = message.get("taskId") or new_context_id
+        task_id = message.get("messageId") or new_task_id
+
+        logger.info("Context ID: %s, Task ID: %s", context_id, task_id)
+        return context_id, task_id
+
+    def extract_user_message(self, parts: list) -> str:
+        logger.info("Found %s parts in message", len(parts))
         
+        if logger.isEnabledFor(logging.INFO):
+            for i, part in enumerate(parts):
+                part_kind = part.get('kind', 'unknown')
+                part_text = part.get('text', '')[:100] if part.get('text') else 'NO_TEXT'
+                logger.info("Part %s: kind=%s, text_preview='%s'", i, part_kind, part_text)
+                
+                if part.get('data'):
+                    logger.info("Part %s data: %s", i, part.get('data'))
+
         
-        bot_indicators = [
-            'here are some', 'steps you can take', 'suggestions to help',
-            'advice for', 'tips that might help', 'consider taking',
-            'you can use', 'it\'s essential to', 'contact a healthcare',
-            'rinse with warm salt water', 'over-the-counter', 'cold compress',
-            'avoid irritating foods', 'maintain oral hygiene', 'topical anesthetics',
-            'stay hydrated', 'see a dentist'
+        data_texts = [
+            item["text"].strip()
+            for part in parts
+            if part.get("kind") == "data" and part.get("data")
+            for item in part["data"]
+            if isinstance(item, dict) and item.get("kind") == "text" and item.get("text")
         ]
+        user_message = self.latest_user_text(data_texts)
         
-      
-        return any(text_lower.startswith(indicator) for indicator in bot_indicators) or any(indicator in text_lower for indicator in bot_indicators)
+        if user_message:
+            logger.info("Selected most recent user message from data: '%s'", user_message)
+        else:
+            text_parts = [
+                part["text"].strip()
+                for part in parts
+                if part.get("kind") == "text" and part.get("text")
+            ]
+            user_message = self.latest_user_text(text_parts)
+            
+            if user_message:
+                logger.info("Selected user message from text parts: '%s'", user_message)
+            else:
+                logger.warning("No user messages found in request")
 
-    def handle_help(self, request_id, params):
-        logger.info(f"Processing help request: {request_id}")
-        help_text = "Available methods: 'message/send' for sending messages, 'help' for this information."
-        
-        return JsonResponse({
+        return user_message
+
+    def handle_message_stream(self, request_id, params: dict) -> HttpResponseBase:
+        logger.info("Processing message/stream request: %s", request_id)
+        try:
+            message = params.get("message", {})
+            context_id, task_id = self.resolve_ids(message)
+            user_message = self.extract_user_message(message.get("parts", []))
+        except Exception as e:
+            logger.exception("Error in handle_message_stream: %s", e)
+            return self.build_error_response(request_id, -32603, f"Internal error: {str(e)}")
+
+        response = StreamingHttpResponse(
+            self.stream_events(request_id, user_message, context_id, task_id),
+            content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    async def stream_events(self, request_id, user_message: str, context_id: str, task_id: str):
+        if classify_intent(user_message) == "greet":
+            replies = iter_text(GREETING_TEXT)
+        else:
+            replies = self.gemini_chat.astream(user_message, context_id)
+
+        artifact_id = new_ids(1)[0]
+        chunks = []
+        try:
+            # Hold each chunk back until the next arrives so the final one can carry lastChunk.
+            async for chunk in replies:
+                if chunks:
+                    yield sse_frame(self.build_artifact_update(request_id, context_id, task_id, artifact_id, chunks[-1], len(chunks) > 1, False))
+                chunks.append(chunk)
+            if chunks:
+                yield sse_frame(self.build_artifact_update(request_id, context_id, task_id, artifact_id, chunks[-1], len(chunks) > 1, True))
+            yield sse_frame(self.build_success_response(request_id, "".join(chunks).strip(), context_id, task_id))
+        except Exception as e:
+            logger.exception("Error while streaming response: %s", e)
+            yield sse_frame(self.build_error_payload(request_id, -32603, f"Internal error: {str(e)}"))
+
+    def build_artifact_update(self, request_id, context_id: str, task_id: str, artifact_id: str, text: str, append: bool, last_chunk: bool) -> dict:
+        return {
             "jsonrpc": "2.0",
             "id": request_id,
             "result": {
-                "id": str(uuid.uuid4()),
-                "contextId": str(uuid.uuid4()),
-                "status": {
-                    "state": "completed",
-                    "timestamp": datetime.utcnow().isoformat() + "Z",
-                    "message": {
-                        "kind": "message",
-                        "role": "agent",
-                        "parts": [
-                            {
-                                "kind": "text",
-                                "text": help_text
-                            }
-                        ],
-                        "messageId": str(uuid.uuid4()),
-                        "taskId": str(uuid.uuid4())
-                    }
+                "kind": "artifact-update",
+                "taskId": task_id,
+                "contextId": context_id,
+                "artifact": {
+                    "artifactId": artifact_id,
+                    "name": "assistantResponse",
+                    "parts": [{"kind": "text", "text": text}]
                 },
-                "artifacts": [
-                    {
-                        "artifactId": str(uuid.uuid4()),
-                        "name": "assistantResponse",
-                        "parts": [
-                            {
-                                "kind": "text",
-                                "text": help_text
-                            }
-                        ]
-                    }
-                ],
-                "history": [
-                    {
-                        "kind": "message",
-                        "role": "agent",
-                        "parts": [
-                            {
-                                "kind": "text",
-                                "text": help_text
-                            }
-                        ],
-                        "messageId": str(uuid.uuid4()),
-                        "taskId": str(uuid.uuid4())
-                    }
-                ],
-                "kind": "task"
+                "append": append,
+                "lastChunk": last_chunk
             }
-        })
+        }
 
-    def build_success_response(self, request_id, response_text, context_id, task_id):
-        logger.info(f"Building success response for request: {request_id}")
-        message_id = str(uuid.uuid4())
-        artifact_id = str(uuid.uuid4())
+    def latest_user_text(self, texts: list) -> str:
+        return next((text for text in reversed(texts) if text and not self.is_bot_response(text)), "")
+
+    def is_bot_response(self, text: str) -> bool:
+        text_lower = text.lower()
+        return any(indicator in text_lower for indicator in BOT_INDICATORS)
+
+    def handle_help(self, request_id, params: dict) -> dict:
+        logger.info("Processing help request: %s", request_id)
+        help_text = "Available methods: 'message/send' for sending messages, 'message/stream' for streamed replies, 'help' for this information."
         
+        return self.build_success_response(request_id, help_text, *new_ids(2))
+
+    def build_success_response(self, request_id, response_text: str, context_id: str, task_id: str) -> dict:
+        logger.info("Building success response for request: %s", request_id)
+        message_id, artifact_id = new_ids(2)
         
+        
+        parts = [{"kind": "text", "text": response_text}]
         response_message = {
             "kind": "message",
             "role": "agent",
-            "parts": [
-                {
-                    "kind": "text",
-                    "text": response_text
-                }
-            ],
+            "parts": parts,
             "messageId": message_id,
             "taskId": task_id
         }
@@ -398,19 +646,14 @@ class A2AHealthView(View):
                 "contextId": context_id, 
                 "status": {
                     "state": "completed",
-                    "timestamp": datetime.utcnow().isoformat() + "Z",  
+                    "timestamp": utc_timestamp(),
                     "message": response_message  
                 },
                 "artifacts": [
                     {
                         "artifactId": artifact_id,
                         "name": "assistantResponse",
-                        "parts": [
-                            {
-                                "kind": "text",
-                                "text": response_text
-                            }
-                        ]
+                        "parts": parts
                     }
                 ],
                 "history": [response_message],
@@ -418,37 +661,22 @@ class A2AHealthView(View):
             }
         }
         
-        logger.info(f"Success response built with context_id: {context_id}, task_id: {task_id}")
+        logger.info("Success response built with context_id: %s, task_id: %s", context_id, task_id)
         return response_data
 
 class HealthCheckView(View):
-    def __init__(self):
-        super().__init__()
-        logger.info("Initializing HealthCheckView...")
-        self.gemini_chat = GeminiHealthChat()
-        logger.info(f"Gemini chat available: {self.gemini_chat.available}")
-
-    def get(self, request):
+    async def get(self, request: HttpRequest) -> HttpResponse:
         logger.info("Health check requested")
-        test_response = "Not tested"
-        if self.gemini_chat.available:
-            try:
-                logger.info("Testing Gemini connection...")
-                test_response = self.gemini_chat.chat("test health question")
-                logger.info(f"Gemini test successful: {test_response}")
-            except Exception as e:
-                logger.error(f"Gemini test failed: {str(e)}")
-                test_response = f"Error: {str(e)}"
-        else:
+        gemini_available = gemini_env_available()
+        if not gemini_available:
             logger.warning("Gemini not available")
         
         health_data = {
             "status": "healthy",
             "service": "health_conversation_agent",
             "timestamp": timezone.now().isoformat(),
-            "gemini_available": self.gemini_chat.available,
-            "test_response": test_response
+            "gemini_available": gemini_available
         }
         
-        logger.info(f"Health check response: {health_data}")
-        return JsonResponse(health_data)
\ No newline at end of file
+        logger.info("Health check response: %s", health_data)
+        return json_response(health_data)